@@ -1,6 +1,14 @@
+import asyncio
 import logging
+import re
 
-from utils.services import init_pg_conn, get_gmail_api_service, get_logger
+from utils.async_gmail import AsyncGmailClient
+from utils.services import (
+    init_pg_conn,
+    get_gmail_api_service,
+    get_gmail_credentials,
+    get_logger,
+)
 
 
 # Configure module logger to output to stdout
@@ -51,12 +59,19 @@ FIELD_ALIASES = {
 
 OPERATORS = {"ANY": "OR", "ALL": "AND"}
 
+# LIKE treats these as wildcards/escape, rule values are matched literally
+LIKE_PREDICATES = ["CONTAINS", "DOES_NOT_CONTAIN"]
+LIKE_SPECIAL_CHARS = re.compile(r"([\\%_])")
+
 
 class EmailFilterEngine:
-    def __init__(self):
+    def __init__(self, concurrency=None):
         self.db_conn = init_pg_conn()
-        self.gmail_service = get_gmail_api_service()
+        self.gmail_credentials = get_gmail_credentials()
+        self.gmail_service = get_gmail_api_service(self.gmail_credentials)
         self.gmail_labels = self.fetch_gmail_labels()
+        # used by apply_rulesets_async: max in-flight requests of the async client
+        self.concurrency = concurrency
 
     def fetch_gmail_labels(self):
         """Fetch existing Gmail labels for the user.
@@ -111,24 +126,36 @@ class EmailFilterEngine:
         except Exception as e:
             raise RuleValidationError(f"Error reading rules from file: {e}")
 
-    def build_condition(self, rule):
+    @staticmethod
+    def build_condition(rule):
         """Build SQL condition from given rule
         Eg. {"field": "FROM", "predicate": "CONTAINS", "value": "example.com"}
         becomes "from_addr LIKE '%example.com%'"
+        Quotes in value are doubled, and for LIKE predicates "%", "_" and "\\"
+        are escaped with a backslash (postgres' default LIKE escape character).
         """
-        value = rule["value"]
         field = rule["field"]
         predicate = rule["predicate"]
+        value = str(rule["value"]).replace("'", "''")
+        if predicate in LIKE_PREDICATES:
+            value = LIKE_SPECIAL_CHARS.sub(r"\\\1", value)
         condition = FIELD_ALIASES[field] + SQL_PREDICATES[predicate].format(value)
         return condition
 
-    def build_rule_query(self, ruleset):
+    @staticmethod
+    def build_rule_query(ruleset):
         """Build SQL query from the entire ruleset.
         Combines individual rule conditions using the overall predicate (AND/OR).
         Eg. For ruleset with overall_predicate "ANY" and two rules(condition),
         it becomes "SELECT id FROM emails WHERE (condition1 OR condition2)"
+        RECEIVED_DATE conditions compare against CURRENT_DATE, which postgres evaluates at
+        executor startup, so for ALL rulesets with a RECEIVED_DATE rule monthly partitions
+        outside the range are pruned. emails_default can't be pruned for these open-ended
+        bounds and is always scanned (the collector keeps it empty).
         """
-        condition_list = [self.build_condition(rule) for rule in ruleset["rules"]]
+        condition_list = [
+            EmailFilterEngine.build_condition(rule) for rule in ruleset["rules"]
+        ]
         op = OPERATORS[ruleset["overall_predicate"]]
         condition = f" {op} ".join(condition_list)
         query = f"SELECT id FROM emails WHERE ({condition})"
@@ -139,6 +166,17 @@ class EmailFilterEngine:
         Use given ruleset to filter emails from DB
         ,perform actions on them in Gmail with Gmail API.
         """
+        email_ids = self.fetch_matching_email_ids(ruleset)
+
+        if email_ids:
+            self.apply_actions(ruleset["actions"], email_ids)
+        else:
+            _LOG.info(
+                f"No emails matched for ruleset: {ruleset['name']}. No actions applied.\n"
+            )
+
+    def fetch_matching_email_ids(self, ruleset):
+        """Return ids of emails in DB matching the given ruleset."""
         # self.validate_ruleset(ruleset)
         query = self.build_rule_query(ruleset)
         _LOG.debug(
@@ -150,19 +188,20 @@ class EmailFilterEngine:
             rows = cursor.fetchall()
 
         _LOG.debug(
-            f"Filtered {len(rows)} emails from DB for ruleset: {ruleset['name']}.\nApplying actions...\n"
+            f"Filtered {len(rows)} emails from DB for ruleset: {ruleset['name']}.\n"
         )
-        # Apply actions to the filtered emails
-
-        if rows:
-            self.apply_actions(ruleset["actions"], [row[0] for row in rows])
-        else:
-            _LOG.info(
-                f"No emails matched for ruleset: {ruleset['name']}. No actions applied.\n"
-            )
+        return [row[0] for row in rows]
 
     def apply_actions(self, actions, email_rows):
         """apply actions to the emails identified by email_rows using gmail_service"""
+        body = self.build_actions_body(actions, email_rows)
+        self.gmail_service.users().messages().batchModify(
+            userId="me", body=body
+        ).execute()
+        _LOG.info(f"Applied actions : {actions}")
+
+    def build_actions_body(self, actions, email_rows):
+        """build batchModify request body applying actions to the emails identified by email_rows"""
         body = {"ids": email_rows}
         for action in actions:
             if action[0] == "MARK_AS_READ":
@@ -176,10 +215,46 @@ class EmailFilterEngine:
 
                 label_id = self.gmail_labels[folder_name.lower()]
                 body.update({"addLabelIds": [label_id]})
-        self.gmail_service.users().messages().batchModify(
-            userId="me", body=body
-        ).execute()
-        _LOG.info(f"Applied actions : {actions}")
+        return body
+
+    async def apply_rulesets_async(self, rulesets):
+        """
+        Apply all rulesets with a single AsyncGmailClient, sending their batchModify calls
+        concurrently with up to `self.concurrency` requests in flight
+        (the client's default when not set).
+        Order between rulesets doesn't matter as actions only add labels or remove UNREAD.
+        """
+        pending = []
+        for ruleset in rulesets:
+            try:
+                email_ids = self.fetch_matching_email_ids(ruleset)
+            except Exception as e:
+                _LOG.error(f"An error occurred while applying ruleset: {e}")
+                continue
+
+            if email_ids:
+                body = self.build_actions_body(ruleset["actions"], email_ids)
+                pending.append((ruleset, body))
+            else:
+                _LOG.info(
+                    f"No emails matched for ruleset: {ruleset['name']}. No actions applied.\n"
+                )
+
+        async with AsyncGmailClient(
+            credentials=self.gmail_credentials, concurrency=self.concurrency
+        ) as client:
+            results = await asyncio.gather(
+                *(client.batch_modify(body) for _, body in pending),
+                return_exceptions=True,
+            )
+
+        for (ruleset, _), result in zip(pending, results):
+            if isinstance(result, Exception):
+                _LOG.error(f"An error occurred while applying ruleset: {result}")
+            else:
+                _LOG.info(
+                    f"Applied ruleset: '{ruleset['name']}' with actions: {ruleset['actions']} successfully."
+                )
 
 
 class RuleValidationError(Exception):
@@ -189,19 +264,38 @@ class RuleValidationError(Exception):
 
 
 if __name__ == "__main__":
-    email_filter = EmailFilterEngine()
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Apply rules.json to emails in DB.")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help="Apply actions with the async Gmail client using up to N concurrent requests",
+    )
+    args = parser.parse_args()
+
+    if args.concurrency is not None and args.concurrency <= 0:
+        _LOG.error("Concurrency must be a positive integer.")
+        sys.exit(1)
+
+    email_filter = EmailFilterEngine(concurrency=args.concurrency)
     rules_data = email_filter.read_rules_from_file("rules.json")
 
-    # iterate through each ruleset and apply respective actions
-    for ruleset in rules_data.get("filters", []):
-        try:
-            email_filter.apply_ruleset(ruleset)
-            _LOG.info(
-                f"Applied ruleset: '{ruleset['name']}' with desc: '{ruleset['description']}' successfully."
-            )
-        except RuleValidationError as e:
-            _LOG.error(f"Rule validation error: {e}")
-        except Exception as e:
-            _LOG.error(f"An error occurred while applying ruleset: {e}")
+    if args.concurrency:
+        asyncio.run(email_filter.apply_rulesets_async(rules_data.get("filters", [])))
+    else:
+        # iterate through each ruleset and apply respective actions
+        for ruleset in rules_data.get("filters", []):
+            try:
+                email_filter.apply_ruleset(ruleset)
+                _LOG.info(
+                    f"Applied ruleset: '{ruleset['name']}' with desc: '{ruleset['description']}' successfully."
+                )
+            except RuleValidationError as e:
+                _LOG.error(f"Rule validation error: {e}")
+            except Exception as e:
+                _LOG.error(f"An error occurred while applying ruleset: {e}")
 
     _LOG.info("Email filtering process completed.")
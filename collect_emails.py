@@ -1,20 +1,32 @@
 import argparse
+import asyncio
 import logging
 import sys
 
-from datetime import datetime
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 
-from utils.services import init_pg_conn, get_gmail_api_service, get_logger
+from utils.async_gmail import AsyncGmailClient
+from utils.partitions import ensure_email_partitions
+from utils.services import (
+    init_pg_conn,
+    get_gmail_api_service,
+    get_gmail_credentials,
+    get_logger,
+)
 
 # Configure module logger to output to stdout
 _LOG = get_logger(__name__, logging.DEBUG)
 
 
 class CollectEmails:
-    def __init__(self, count=10):
+    def __init__(self, count=10, concurrency=None):
         self.db_conn = init_pg_conn()
-        self.gmail_service = get_gmail_api_service()
+        self.gmail_credentials = get_gmail_credentials()
+        self.gmail_service = get_gmail_api_service(self.gmail_credentials)
         self.count = count
+        # when set, email metadata is fetched with the async client using up to `concurrency` in-flight requests
+        self.concurrency = concurrency
 
     def read_emails_from_gmail(self):
         """
@@ -44,7 +56,10 @@ class CollectEmails:
             _LOG.error(f"An error occurred while listing emails from Gmail API: {e}")
             return
 
-        email_values = self.get_email_details(emails)
+        if self.concurrency:
+            email_values = self.get_email_details_async(emails)
+        else:
+            email_values = self.get_email_details(emails)
         _LOG.debug(f"Fetched {len(email_values)} emails from Gmail.")
         return email_values
 
@@ -67,15 +82,12 @@ class CollectEmails:
             _LOG.debug(f"Request ID {request_id} succeeded.")
             header_map = {h["name"]: h["value"] for h in response["payload"]["headers"]}
             received_date = header_map.get("Date", "")
-            if received_date:
-                try:
-                    received_date = datetime.strptime(
-                        received_date.split(" (")[0], "%a, %d %b %Y %H:%M:%S %z"
-                    )
-                except ValueError:
-                    _LOG.error(
-                        f"Date parsing error for email ID {response['id']}: {received_date}"
-                    )
+            try:
+                received_date = datetime.strptime(
+                    received_date.split(" (")[0], "%a, %d %b %Y %H:%M:%S %z"
+                )
+            except ValueError:
+                received_date = self.parse_fallback_date(response, received_date)
             results.append(
                 (
                     response["id"],
@@ -86,6 +98,26 @@ class CollectEmails:
                 )
             )
 
+    def parse_fallback_date(self, response, date_header):
+        """
+        Parse a missing or unexpected Date header (eg. "GMT" instead of an offset),
+        falling back to Gmail's internalDate. Returns None if neither can be used.
+        """
+        try:
+            return parsedate_to_datetime(date_header)
+        except (TypeError, ValueError):
+            pass
+
+        internal_date = response.get("internalDate")
+        if internal_date:
+            _LOG.debug(
+                f"Using internalDate for email ID {response['id']}, unparsable Date: {date_header}"
+            )
+            return datetime.fromtimestamp(int(internal_date) / 1000, tz=timezone.utc)
+
+        _LOG.error(f"Date parsing error for email ID {response['id']}: {date_header}")
+        return None
+
     def get_email_details(self, emails):
         """
         Fetch email metadata (subject, from, to, date) for a list of email IDs
@@ -128,6 +160,41 @@ class CollectEmails:
             )
         return email_values
 
+    def get_email_details_async(self, emails):
+        """
+        Same as get_email_details, but fetches metadata with AsyncGmailClient
+        keeping up to `self.concurrency` requests in flight over pooled connections
+        (the client's default when not set).
+        Returns a list of tuples with email details.
+        Each email detail tuple is : (id, subject, from, to, date)"""
+        email_values = []
+
+        async def fetch_metadata():
+            async with AsyncGmailClient(
+                credentials=self.gmail_credentials, concurrency=self.concurrency
+            ) as client:
+                return await client.batch_get(
+                    [email["id"] for email in emails],
+                    format="metadata",
+                    metadata_headers=["Subject", "From", "To", "Date"],
+                )
+
+        try:
+            responses = asyncio.run(fetch_metadata())
+        except Exception as e:
+            _LOG.error(f"An error occurred while fetching email metadata: {e}")
+            return email_values
+
+        for email_id, response, exception in responses:
+            self.email_metadata_callback(
+                f"get-email-metadata-{email_id}", response, exception, email_values
+            )
+
+        _LOG.debug(
+            f"Fetched metadata for {len(email_values)} emails with the async Gmail client."
+        )
+        return email_values
+
     def fetch_and_store_emails_in_db(self):
         """
         Fetche emails from Gmail and store in PostgreSQL database.
@@ -142,8 +209,19 @@ class CollectEmails:
             _LOG.error("No database connection available.")
             return
 
+        # rows without a parsed date can't be placed in a monthly partition, don't store them
+        valid_values = [
+            email for email in email_values if isinstance(email[4], datetime)
+        ]
+        if len(valid_values) < len(email_values):
+            _LOG.error(
+                f"Skipping {len(email_values) - len(valid_values)} emails without a valid received date."
+            )
+        email_values = valid_values
+
         insert_query = "INSERT INTO emails (id, subject_title, from_addr, to_addr, received_date) VALUES (%s, %s, %s, %s, %s);"
         try:
+            ensure_email_partitions(self.db_conn, [email[4] for email in email_values])
             with self.db_conn.cursor() as cursor:
                 cursor.executemany(insert_query, email_values)
             self.db_conn.commit()
@@ -160,6 +238,12 @@ if __name__ == "__main__":
     parser.add_argument(
         "--count", type=int, default=10, help="Number of emails to collect"
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help="Fetch email metadata with the async Gmail client using up to N concurrent requests",
+    )
     args = parser.parse_args()
 
     if args.count <= 0:
@@ -168,8 +252,10 @@ if __name__ == "__main__":
         _LOG.error(
             "Count exceeds the maximum limit of 100. You risk hitting API limits."
         )
+    elif args.concurrency is not None and args.concurrency <= 0:
+        _LOG.error("Concurrency must be a positive integer.")
     else:
         _LOG.info(f"Collecting {args.count} emails from Gmail and storing in DB.")
 
-        collector = CollectEmails(count=args.count)
+        collector = CollectEmails(count=args.count, concurrency=args.concurrency)
         collector.fetch_and_store_emails_in_db()
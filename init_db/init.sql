@@ -1,9 +1,18 @@
 \c emaildb;
 
+-- emails are range partitioned by month of received_date (partitions named emails_YYYY_MM).
+-- Monthly partitions are created on demand by utils/partitions.ensure_email_partitions,
+-- old ones are archived and dropped by utils/backup.archive_old_emails.
 CREATE TABLE IF NOT EXISTS emails (
-    id VARCHAR(16) PRIMARY KEY,
+    id VARCHAR(16) NOT NULL,
     subject_title TEXT,
     from_addr TEXT,
     to_addr TEXT,
-    received_date TIMESTAMP
-);
+    received_date TIMESTAMP NOT NULL,
+    PRIMARY KEY (id, received_date)
+) PARTITION BY RANGE (received_date);
+
+-- catch-all for rows inserted without a matching monthly partition
+CREATE TABLE IF NOT EXISTS emails_default PARTITION OF emails DEFAULT;
+
+CREATE INDEX IF NOT EXISTS emails_received_date_idx ON emails (received_date);
@@ -0,0 +1,182 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from utils.async_gmail import (
+    AsyncGmailClient,
+    BatchModifyError,
+    BATCH_MODIFY_LIMIT,
+    DEFAULT_CONCURRENCY,
+)
+
+
+class FakeCredentials:
+    """Stand-in for google oauth credentials, always valid."""
+
+    valid = True
+    token = "test-token"
+
+
+def get_test_client(handler, **kwargs):
+    return AsyncGmailClient(
+        credentials=FakeCredentials(),
+        http2=False,
+        backoff=0,
+        transport=httpx.MockTransport(handler),
+        **kwargs,
+    )
+
+
+def test_batch_get():
+    """Test concurrent metadata fetch returns (id, response, exception) per message in order."""
+
+    def handler(request):
+        assert request.headers["Authorization"] == "Bearer test-token"
+        message_id = request.url.path.rsplit("/", 1)[-1]
+        if message_id == "bad":
+            return httpx.Response(404, json={"error": "not found"})
+        return httpx.Response(200, json={"id": message_id, "payload": {"headers": []}})
+
+    async def run():
+        async with get_test_client(handler, concurrency=2) as client:
+            return await client.batch_get(
+                ["a", "bad", "c"], metadata_headers=["Subject", "From"]
+            )
+
+    results = asyncio.run(run())
+    assert [r[0] for r in results] == ["a", "bad", "c"]
+    assert results[0][1]["id"] == "a" and results[0][2] is None
+    assert results[1][1] is None and isinstance(results[1][2], httpx.HTTPStatusError)
+    assert results[2][1]["id"] == "c"
+
+
+def test_retry_on_rate_limit():
+    """Test 429 responses are retried before succeeding."""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(429)
+        return httpx.Response(200, json={"messages": [{"id": "a"}]})
+
+    async def run():
+        async with get_test_client(handler) as client:
+            return await client.list_messages(label_ids=["INBOX"], max_results=5)
+
+    results = asyncio.run(run())
+    assert results["messages"] == [{"id": "a"}]
+    assert len(calls) == 3
+    assert calls[-1].url.params["labelIds"] == "INBOX"
+
+
+def test_batch_modify_chunks_ids():
+    """Test batchModify splits ids beyond the API limit into multiple calls."""
+    bodies = []
+
+    def handler(request):
+        bodies.append(json.loads(request.content))
+        return httpx.Response(204)
+
+    ids = [str(i) for i in range(BATCH_MODIFY_LIMIT + 5)]
+
+    async def run():
+        async with get_test_client(handler) as client:
+            await client.batch_modify({"ids": ids, "removeLabelIds": ["UNREAD"]})
+
+    asyncio.run(run())
+    assert sorted(len(b["ids"]) for b in bodies) == [5, BATCH_MODIFY_LIMIT]
+    assert all(b["removeLabelIds"] == ["UNREAD"] for b in bodies)
+
+
+def test_retry_on_transport_error():
+    """Test connection errors are retried, and raised once retries run out."""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 2:
+            raise httpx.ConnectError("connection reset", request=request)
+        return httpx.Response(200, json={"id": "a"})
+
+    async def run(client_handler, **kwargs):
+        async with get_test_client(client_handler, **kwargs) as client:
+            return await client.get_message("a")
+
+    assert asyncio.run(run(handler))["id"] == "a"
+    assert len(calls) == 2
+
+    def failing_handler(request):
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(run(failing_handler, max_retries=1))
+
+
+def test_batch_modify_reports_failed_chunks():
+    """Test all chunks are sent even if one fails, then the failed chunk is reported."""
+    bodies = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        bodies.append(body)
+        if body["ids"][0] == "0":
+            return httpx.Response(400, json={"error": {"code": 400}})
+        return httpx.Response(204)
+
+    ids = [str(i) for i in range(2 * BATCH_MODIFY_LIMIT + 5)]
+
+    async def run():
+        async with get_test_client(handler) as client:
+            await client.batch_modify({"ids": ids, "removeLabelIds": ["UNREAD"]})
+
+    with pytest.raises(BatchModifyError) as error:
+        asyncio.run(run())
+    assert len(bodies) == 3
+    assert f"1 of 3 batchModify chunks failed: ids 0-{BATCH_MODIFY_LIMIT - 1}" in str(
+        error.value
+    )
+
+
+def test_retry_on_rate_limit_403(monkeypatch):
+    """Test 403 rate limit errors are retried after Retry-After, other 403s are not."""
+    calls = []
+    sleeps = []
+
+    def handler(request):
+        calls.append(request)
+        if request.url.path.endswith("/forbidden"):
+            return httpx.Response(
+                403, json={"error": {"errors": [{"reason": "insufficientPermissions"}]}}
+            )
+        if len(calls) < 2:
+            return httpx.Response(
+                403,
+                headers={"Retry-After": "2"},
+                json={"error": {"errors": [{"reason": "userRateLimitExceeded"}]}},
+            )
+        return httpx.Response(200, json={"id": "a"})
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    async def run(message_id):
+        async with get_test_client(handler) as client:
+            return await client.get_message(message_id)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    assert asyncio.run(run("a"))["id"] == "a"
+    assert sleeps == [2.0]
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run("forbidden"))
+    assert sleeps == [2.0]
+
+
+def test_default_concurrency():
+    """Test concurrency of None falls back to the default."""
+    client = get_test_client(lambda request: httpx.Response(204), concurrency=None)
+    assert client.concurrency == DEFAULT_CONCURRENCY
+    asyncio.run(client.aclose())
@@ -0,0 +1,381 @@
+"""
+Randomized equivalence and load harness for the rule compiler.
+
+Generates random rulesets and email rows, and checks that every evaluation path
+(SQL from build_rule_query, and the reference in-memory evaluator filter_emails below)
+returns the same match set. New evaluation paths of the rules engine should be added
+to the comparisons here.
+
+SQL runs against an in-memory SQLite stand-in (always) and a throwaway TEMP table in
+the local Postgres (skipped if it isn't reachable), so real data is never touched.
+Set RULES_EQUIVALENCE_SEED to reproduce a failing run.
+
+Generated values include quotes, LIKE wildcards and backslashes, which rule values
+must match literally.
+"""
+
+import calendar
+import os
+import random
+import re
+import sqlite3
+import time
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from apply_rules import (
+    EmailFilterEngine,
+    FIELD_ALIASES,
+    RULES_VALIDATORS,
+    RuleValidationError,
+)
+
+
+SEED = int(os.environ.get("RULES_EQUIVALENCE_SEED", random.randrange(2**32)))
+RULESETS_PER_BACKEND = 200
+EMAILS_PER_BACKEND = 300
+LOAD_TEST_EMAILS = 5000
+LOAD_TEST_RULESET_SIZES = [1, 5, 25, 100]
+
+# small alphabets so generated values and email columns overlap often
+WORDS = ["github", "GitHub", "news", "alert", "team", "mail", "pay", "Re:", ""]
+# LIKE wildcards, quotes and backslashes, eg. "first_last" must not match "firstXlast"
+SPECIAL_WORDS = [
+    "first_last",
+    "firstXlast",
+    "100%",
+    "100 pct",
+    "O'Brien",
+    "back\\slash",
+]
+DOMAINS = ["github.com", "example.com", "mail.example.com", "lavorro.com"]
+INTERVAL_VALUES = [
+    "{} minutes",
+    "{} hours",
+    "{} days",
+    "{} weeks",
+    "{} months",
+    "{} years",
+]
+# few amounts, so emails generated on a cutoff often meet a rule with the same interval
+INTERVAL_AMOUNTS = [0, 1, 2, 7, 30]
+
+STRING_FIELDS = RULES_VALIDATORS["RULES"]["STRING_VALUE"]["FIELDS"]
+STRING_PREDICATES = RULES_VALIDATORS["RULES"]["STRING_VALUE"]["PREDICATES"]
+TIME_FIELDS = RULES_VALIDATORS["RULES"]["TIME_VALUE"]["FIELDS"]
+TIME_PREDICATES = RULES_VALIDATORS["RULES"]["TIME_VALUE"]["PREDICATES"]
+OVERALL_PREDICATES = RULES_VALIDATORS["RULES"]["OVERALL_PREDICATES"]
+
+# column order of email rows, as stored in DB and backups: (id, subject, from, to, date)
+EMAIL_COLUMNS = ["id", "subject_title", "from_addr", "to_addr", "received_date"]
+
+# postgres interval units supported by the in-memory evaluator
+INTERVAL_UNITS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+INTERVAL_MONTHS = {"month": 1, "year": 12}
+
+
+def interval_cutoff(value, today):
+    """
+    In-memory equivalent of "CURRENT_DATE - INTERVAL '<value>'" in postgres.
+    Eg. "3 months" with today 2025-05-31 becomes 2025-02-28 00:00
+    (postgres clamps the day when subtracting months).
+    """
+    try:
+        amount, unit = value.split()
+        amount = int(amount)
+    except (AttributeError, ValueError):
+        raise RuleValidationError(f"Invalid time value: {value}")
+    unit = unit.lower().removesuffix("s")
+    midnight = datetime(today.year, today.month, today.day)
+
+    if unit in INTERVAL_UNITS:
+        return midnight - amount * INTERVAL_UNITS[unit]
+    if unit in INTERVAL_MONTHS:
+        index = today.year * 12 + today.month - 1 - amount * INTERVAL_MONTHS[unit]
+        year, month = index // 12, index % 12 + 1
+        day = min(today.day, calendar.monthrange(year, month)[1])
+        return datetime(year, month, day)
+    raise RuleValidationError(f"Invalid time value: {value}")
+
+
+def match_rule(rule, email, today):
+    """Reference equivalent of build_condition for one email row.
+    Values match literally. NULL columns never match, same as the SQL condition in a WHERE clause.
+    """
+    value = rule["value"]
+    predicate = rule["predicate"]
+    column = email[EMAIL_COLUMNS.index(FIELD_ALIASES[rule["field"]])]
+    if column is None:
+        return False
+
+    if predicate == "CONTAINS":
+        return value in column
+    if predicate == "DOES_NOT_CONTAIN":
+        return value not in column
+    if predicate == "EQUALS":
+        return column == value
+    if predicate == "NOT_EQUAL":
+        return column != value
+    if predicate == "LESS_THAN":
+        return column > interval_cutoff(value, today)
+    if predicate == "GREATER_THAN":
+        return column < interval_cutoff(value, today)
+    raise RuleValidationError(f"Invalid predicate: {predicate}")
+
+
+def filter_emails(ruleset, emails, today):
+    """Reference equivalent of build_rule_query.
+    Returns ids of email rows (id, subject, from, to, date) matching the ruleset.
+    `today` stands in for CURRENT_DATE.
+    """
+    combine = all if ruleset["overall_predicate"] == "ALL" else any
+    return [
+        email[0]
+        for email in emails
+        if combine(match_rule(rule, email, today) for rule in ruleset["rules"])
+    ]
+
+
+def random_word(rng):
+    return rng.choice(SPECIAL_WORDS) if rng.random() < 0.2 else rng.choice(WORDS)
+
+
+def random_address(rng):
+    return f"{random_word(rng)} <{random_word(rng)}@{rng.choice(DOMAINS)}>"
+
+
+def random_interval(rng):
+    return rng.choice(INTERVAL_VALUES).format(rng.choice(INTERVAL_AMOUNTS))
+
+
+def random_email(rng, index, today):
+    """Random email row (id, subject, from, to, date). Text columns are sometimes NULL."""
+
+    def nullable(value):
+        return None if rng.random() < 0.05 else value
+
+    if rng.random() < 0.2:
+        # exactly on a cutoff to exercise strict comparisons
+        received_date = interval_cutoff(random_interval(rng), today)
+    else:
+        received_date = datetime(today.year, today.month, today.day) - timedelta(
+            seconds=rng.randint(-86400, 3 * 365 * 86400)
+        )
+    subject = " ".join(random_word(rng) for _ in range(rng.randint(0, 4)))
+    return (
+        f"{index:016x}",
+        nullable(subject),
+        nullable(random_address(rng)),
+        nullable(random_address(rng)),
+        received_date,
+    )
+
+
+def random_rule(rng, emails):
+    if rng.random() < 0.3:
+        return {
+            "field": rng.choice(TIME_FIELDS),
+            "predicate": rng.choice(TIME_PREDICATES),
+            "value": random_interval(rng),
+        }
+
+    field = rng.choice(STRING_FIELDS)
+    predicate = rng.choice(STRING_PREDICATES)
+    column = {"FROM": 2, "TO": 3, "SUBJECT": 1}[field]
+    # mostly pick values from existing rows so rules actually match something
+    source = rng.choice(emails)[column]
+    if source and rng.random() < 0.7:
+        if predicate in ("EQUALS", "NOT_EQUAL"):
+            value = source
+        else:
+            start = rng.randint(0, len(source))
+            value = source[start : rng.randint(start, len(source))]
+    else:
+        value = rng.choice(WORDS + SPECIAL_WORDS + DOMAINS + ["_", "%", "'", "\\"])
+    return {"field": field, "predicate": predicate, "value": value}
+
+
+def random_ruleset(rng, emails, size):
+    return {
+        "name": f"random_{size}",
+        "rules": [random_rule(rng, emails) for _ in range(size)],
+        "overall_predicate": rng.choice(OVERALL_PREDICATES),
+    }
+
+
+class SqliteBackend:
+    """
+    SQLite stand-in for the emails table, translating postgres intervals to SQLite date modifiers
+    and adding the backslash LIKE escape that postgres uses by default.
+    """
+
+    name = "sqlite"
+    # day of month <= 28, SQLite month arithmetic overflows instead of clamping like postgres
+    today = date(2025, 6, 15)
+    interval_re = re.compile(r"\(CURRENT_DATE - INTERVAL '(\d+) (\w+?)s?'\)")
+    like_re = re.compile(r"( LIKE '(?:[^']|'')*')")
+
+    def __init__(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute("PRAGMA case_sensitive_like = ON;")
+        self.conn.execute(
+            "CREATE TABLE emails (id TEXT PRIMARY KEY, subject_title TEXT, from_addr TEXT, to_addr TEXT, received_date TEXT);"
+        )
+
+    def translate_interval(self, match):
+        amount, unit = int(match[1]), match[2]
+        if unit == "week":
+            amount, unit = amount * 7, "day"
+        return f"datetime('{self.today.isoformat()}', '-{amount} {unit}s')"
+
+    def load(self, emails):
+        self.conn.execute("DELETE FROM emails;")
+        self.conn.executemany(
+            "INSERT INTO emails VALUES (?, ?, ?, ?, ?);",
+            [email[:4] + (email[4].isoformat(" "),) for email in emails],
+        )
+
+    def select_ids(self, query):
+        query = self.interval_re.sub(self.translate_interval, query)
+        query = self.like_re.sub(r"\1 ESCAPE '\\'", query)
+        return {row[0] for row in self.conn.execute(query)}
+
+    def close(self):
+        self.conn.close()
+
+
+class PostgresBackend:
+    """Runs queries against a TEMP emails table, which shadows the real one for this session."""
+
+    name = "postgres"
+
+    def __init__(self, conn):
+        self.conn = conn
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMP TABLE emails (id VARCHAR(16) PRIMARY KEY, subject_title TEXT, from_addr TEXT, to_addr TEXT, received_date TIMESTAMP);"
+            )
+            cursor.execute("SELECT CURRENT_DATE;")
+            self.today = cursor.fetchone()[0]
+
+    def load(self, emails):
+        with self.conn.cursor() as cursor:
+            cursor.execute("TRUNCATE emails;")
+            cursor.executemany(
+                "INSERT INTO emails VALUES (%s, %s, %s, %s, %s);", emails
+            )
+
+    def select_ids(self, query):
+        with self.conn.cursor() as cursor:
+            cursor.execute(query)
+            return {row[0] for row in cursor.fetchall()}
+
+    def close(self):
+        self.conn.rollback()
+        self.conn.close()
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def backend(request):
+    """
+    Pytest fixture that provides a throwaway emails table for each SQL backend.
+    """
+    if request.param == "sqlite":
+        sql_backend = SqliteBackend()
+    else:
+        psycopg2 = pytest.importorskip("psycopg2")
+        try:
+            conn = psycopg2.connect(
+                dbname="emaildb", user="atr", password="password", host="localhost"
+            )
+        except psycopg2.Error as e:
+            pytest.skip(f"Postgres not available: {e}")
+        sql_backend = PostgresBackend(conn)
+    yield sql_backend
+    sql_backend.close()
+
+
+def test_interval_cutoff():
+    """Test in-memory interval arithmetic follows postgres, incl. clamping month ends."""
+    today = date(2025, 5, 31)
+    assert interval_cutoff("10 days", today) == datetime(2025, 5, 21)
+    assert interval_cutoff("1 week", today) == datetime(2025, 5, 24)
+    assert interval_cutoff("3 months", today) == datetime(2025, 2, 28)
+    assert interval_cutoff("1 year", date(2024, 2, 29)) == datetime(2023, 2, 28)
+    assert interval_cutoff("5 hours", today) == datetime(2025, 5, 30, 19)
+
+
+def test_special_characters_match_literally(backend):
+    """LIKE wildcards, quotes and backslashes in rule values must not change what matches."""
+    emails = [
+        ("a", "100% off", "firstXlast@x.com", "O'Brien", datetime(2025, 1, 1)),
+        ("b", "100 pct", "first_last@x.com", "back\\slash", datetime(2025, 1, 1)),
+    ]
+    backend.load(emails)
+
+    for field, value, expected in [
+        ("FROM", "first_last", {"b"}),
+        ("SUBJECT", "100%", {"a"}),
+        ("TO", "O'B", {"a"}),
+        ("TO", "k\\s", {"b"}),
+    ]:
+        ruleset = {
+            "rules": [{"field": field, "predicate": "CONTAINS", "value": value}],
+            "overall_predicate": "ALL",
+        }
+        query = EmailFilterEngine.build_rule_query(ruleset)
+        assert backend.select_ids(query) == expected, query
+        assert set(filter_emails(ruleset, emails, backend.today)) == expected
+
+
+def test_sql_and_in_memory_paths_match(backend):
+    """Random rulesets must select the same emails through SQL and in-memory evaluation."""
+    rng = random.Random(SEED)
+    emails = [random_email(rng, i, backend.today) for i in range(EMAILS_PER_BACKEND)]
+    backend.load(emails)
+
+    for _ in range(RULESETS_PER_BACKEND):
+        ruleset = random_ruleset(rng, emails, rng.randint(1, 6))
+        query = EmailFilterEngine.build_rule_query(ruleset)
+
+        sql_ids = backend.select_ids(query)
+        memory_ids = set(filter_emails(ruleset, emails, backend.today))
+        assert sql_ids == memory_ids, (
+            f"{backend.name} and in-memory results differ (seed {SEED}).\n"
+            f"Ruleset: {ruleset}\nQuery: {query}\n"
+            f"Only in SQL: {sql_ids - memory_ids}\nOnly in memory: {memory_ids - sql_ids}"
+        )
+
+
+@pytest.mark.parametrize("size", LOAD_TEST_RULESET_SIZES)
+def test_evaluation_time_per_ruleset_size(backend, size, record_property):
+    """
+    Load test: time each evaluation path for rulesets of given size.
+    Timings are recorded as test properties (see --junitxml) and asserted only for equivalence.
+    """
+    rng = random.Random(SEED + size)
+    emails = [random_email(rng, i, backend.today) for i in range(LOAD_TEST_EMAILS)]
+    backend.load(emails)
+    ruleset = random_ruleset(rng, emails, size)
+
+    start = time.perf_counter()
+    sql_ids = backend.select_ids(EmailFilterEngine.build_rule_query(ruleset))
+    sql_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    memory_ids = set(filter_emails(ruleset, emails, backend.today))
+    memory_time = time.perf_counter() - start
+
+    record_property(f"{backend.name}_sql_seconds", sql_time)
+    record_property("in_memory_seconds", memory_time)
+    print(
+        f"{size} rules x {LOAD_TEST_EMAILS} emails: {backend.name} SQL {sql_time:.4f}s, in-memory {memory_time:.4f}s"
+    )
+    assert sql_ids == memory_ids, f"Results differ (seed {SEED}). Ruleset: {ruleset}"
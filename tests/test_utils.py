@@ -1,3 +1,12 @@
+from datetime import date, datetime
+
+from utils.partitions import (
+    add_months,
+    ensure_email_partitions,
+    list_email_partitions,
+    month_start,
+    partition_name,
+)
 from utils.services import (
     init_pg_conn,
     get_gmail_api_service,
@@ -30,3 +39,34 @@ def test_get_gmail_api_service():
     profile = service.users().getProfile(userId="me").execute()
     assert "emailAddress" in profile
     assert profile["emailAddress"] is not None
+
+
+def test_partition_month_helpers():
+    """
+    Test month arithmetic and naming used for emails partitions.
+    """
+    assert add_months(date(2025, 11, 1), 2) == date(2026, 1, 1)
+    assert add_months(date(2025, 1, 1), -13) == date(2023, 12, 1)
+    assert month_start(datetime(2025, 11, 19, 21, 3, 53)) == date(2025, 11, 1)
+    assert partition_name(date(2025, 3, 1)) == "emails_2025_03"
+
+
+def test_ensure_email_partitions():
+    """
+    Test monthly partitions of emails table are created for given dates.
+    Changes are rolled back after test.
+    """
+    conn = init_pg_conn()
+    assert conn is not None
+
+    try:
+        ensure_email_partitions(
+            conn, [datetime(2001, 1, 15), datetime(2001, 1, 20), datetime(2001, 3, 2)]
+        )
+        partitions = dict(list_email_partitions(conn))
+        assert partitions["emails_2001_01"] == date(2001, 1, 1)
+        assert partitions["emails_2001_03"] == date(2001, 3, 1)
+        assert "emails_2001_02" not in partitions
+    finally:
+        conn.rollback()
+        conn.close()
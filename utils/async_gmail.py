@@ -0,0 +1,201 @@
+import asyncio
+import logging
+
+import httpx
+
+from google.auth.transport.requests import Request
+
+from utils.services import get_gmail_credentials, get_logger
+
+_LOG = get_logger(__name__, logging.DEBUG)
+
+"""
+asyncio based Gmail API client.
+
+googleapiclient blocks on every execute() call, so overlapping requests needs threads.
+This client talks to the Gmail REST API directly over a pooled keep-alive httpx client
+(HTTP/2 when available), so hundreds of requests can be in flight from a single thread.
+"""
+
+GMAIL_API_URL = "https://gmail.googleapis.com/gmail/v1/users/me"
+
+DEFAULT_CONCURRENCY = 50
+BATCH_MODIFY_LIMIT = 1000  # max ids accepted by messages.batchModify in one call
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# gmail also reports per-user rate limits as 403 with one of these error reasons
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+class AsyncGmailClient:
+    def __init__(
+        self,
+        credentials=None,
+        concurrency=None,
+        http2=True,
+        max_retries=3,
+        backoff=0.5,
+        transport=None,
+    ):
+        self.credentials = credentials or get_gmail_credentials()
+        concurrency = concurrency or DEFAULT_CONCURRENCY
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        # caps in-flight requests; the connection pool is sized to match
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._refresh_lock = asyncio.Lock()
+        self._client = httpx.AsyncClient(
+            base_url=GMAIL_API_URL,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=concurrency, max_keepalive_connections=concurrency
+            ),
+            timeout=httpx.Timeout(30.0),
+            transport=transport,
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def _auth_headers(self):
+        """Return auth header, refreshing the access token once if it has expired."""
+        if not self.credentials.valid:
+            async with self._refresh_lock:
+                if not self.credentials.valid:
+                    await asyncio.to_thread(self.credentials.refresh, Request())
+        return {"Authorization": f"Bearer {self.credentials.token}"}
+
+    @staticmethod
+    def _should_retry(response):
+        """Return True for server errors and rate limits (429, or 403 with a rate limit reason)."""
+        if response.status_code in RETRY_STATUSES:
+            return True
+        if response.status_code != 403:
+            return False
+        try:
+            errors = response.json()["error"]["errors"]
+        except (ValueError, KeyError, TypeError):
+            return False
+        return any(error.get("reason") in RATE_LIMIT_REASONS for error in errors)
+
+    @staticmethod
+    def _retry_after(response):
+        """Return seconds to wait from a Retry-After header, None if missing or not in seconds."""
+        try:
+            return max(float(response.headers["Retry-After"]), 0)
+        except (KeyError, ValueError):
+            return None
+
+    async def _request(self, method, path, **kwargs):
+        """
+        Send a single API request, retrying rate limit, server and transport errors
+        with exponential backoff, or after Retry-After when the response sets it.
+        Returns the decoded JSON body (empty dict for empty responses).
+        """
+        for attempt in range(self.max_retries + 1):
+            can_retry = attempt < self.max_retries
+            headers = await self._auth_headers()
+            try:
+                async with self._semaphore:
+                    response = await self._client.request(
+                        method, path, headers=headers, **kwargs
+                    )
+            except httpx.TransportError as e:
+                # connection resets, HTTP/2 GOAWAY, connect/read/pool timeouts
+                if not can_retry:
+                    raise
+                error = repr(e)
+                delay = None
+            else:
+                if not self._should_retry(response) or not can_retry:
+                    response.raise_for_status()
+                    return response.json() if response.content else {}
+                error = response.status_code
+                delay = self._retry_after(response)
+
+            # back off without holding a concurrency slot
+            if delay is None:
+                delay = self.backoff * 2**attempt
+            _LOG.debug(f"{method} {path} failed: {error}, retrying in {delay}s")
+            await asyncio.sleep(delay)
+
+    async def list_messages(self, label_ids=None, max_results=100, page_token=None):
+        """users.messages.list"""
+        params = {"maxResults": max_results}
+        if label_ids:
+            params["labelIds"] = label_ids
+        if page_token:
+            params["pageToken"] = page_token
+        return await self._request("GET", "/messages", params=params)
+
+    async def get_message(self, message_id, format="metadata", metadata_headers=None):
+        """users.messages.get"""
+        params = {"format": format}
+        if metadata_headers:
+            params["metadataHeaders"] = metadata_headers
+        return await self._request("GET", f"/messages/{message_id}", params=params)
+
+    async def batch_get(self, message_ids, format="metadata", metadata_headers=None):
+        """
+        Fetch many messages concurrently, bounded by `concurrency`.
+        Takes the place of googleapiclient batch requests: with keep-alive/HTTP2 connections
+        individual requests cost about the same on the wire, and a failure only affects its own message.
+        Returns a list of (message_id, response, exception) tuples in input order,
+        matching the arguments of a batch request callback.
+        """
+        responses = await asyncio.gather(
+            *(
+                self.get_message(message_id, format, metadata_headers)
+                for message_id in message_ids
+            ),
+            return_exceptions=True,
+        )
+        results = []
+        for message_id, response in zip(message_ids, responses):
+            if isinstance(response, Exception):
+                results.append((message_id, None, response))
+            else:
+                results.append((message_id, response, None))
+        return results
+
+    async def batch_modify(self, body):
+        """
+        users.messages.batchModify
+        `body` is the same dict passed to googleapiclient: {"ids": [...], "addLabelIds": [...], "removeLabelIds": [...]}.
+        Ids beyond the API limit of 1000 per call are split into chunks sent concurrently.
+        All chunks run to completion, then BatchModifyError is raised if any of them failed.
+        """
+        ids = body.get("ids", [])
+        chunks = [
+            dict(body, ids=ids[i : i + BATCH_MODIFY_LIMIT])
+            for i in range(0, len(ids), BATCH_MODIFY_LIMIT)
+        ]
+        results = await asyncio.gather(
+            *(
+                self._request("POST", "/messages/batchModify", json=chunk)
+                for chunk in chunks
+            ),
+            return_exceptions=True,
+        )
+        failures = [
+            f"ids {index * BATCH_MODIFY_LIMIT}-{index * BATCH_MODIFY_LIMIT + len(chunk['ids']) - 1}: {result!r}"
+            for index, (chunk, result) in enumerate(zip(chunks, results))
+            if isinstance(result, Exception)
+        ]
+        if failures:
+            raise BatchModifyError(
+                f"{len(failures)} of {len(chunks)} batchModify chunks failed: "
+                + "; ".join(failures)
+            )
+
+
+class BatchModifyError(Exception):
+    """Raised when some chunks of a batchModify call failed."""
+
+    pass
@@ -1,5 +1,17 @@
 import logging
+import os
 
+from datetime import date
+
+from psycopg2 import sql
+
+from utils.partitions import (
+    add_months,
+    ensure_email_partitions,
+    list_email_partitions,
+    month_start,
+    partition_name,
+)
 from utils.services import init_pg_conn, get_logger
 
 _LOG = get_logger(__name__, logging.DEBUG)
@@ -35,16 +47,18 @@ def backup_emails_to_pkl():
     finally:
         conn.close()
 
+
 def purge_emails_table():
     conn = init_pg_conn()
     if not conn:
         _LOG.debug("No database connection available.")
         return
 
-    delete_query = "DELETE FROM emails;"
+    # TRUNCATE empties all partitions without leaving dead rows behind like DELETE does
+    truncate_query = "TRUNCATE emails;"
     try:
         with conn.cursor() as cursor:
-            cursor.execute(delete_query)
+            cursor.execute(truncate_query)
         conn.commit()
         _LOG.debug("Purged all emails from the emails table.")
     except Exception as e:
@@ -52,7 +66,94 @@ def purge_emails_table():
     finally:
         conn.close()
 
-def restore_emails_from_pkl():
+
+def purge_emails_partition(month):
+    """Drop all emails received in the month of given date by dropping its partition."""
+    conn = init_pg_conn()
+    if not conn:
+        _LOG.debug("No database connection available.")
+        return
+
+    name = partition_name(month_start(month))
+    try:
+        # dropping a partition directly also removes it from emails, no DETACH needed
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("DROP TABLE {};").format(sql.Identifier(name)))
+        conn.commit()
+        _LOG.debug(f"Purged emails partition {name}.")
+    except Exception as e:
+        conn.rollback()
+        _LOG.debug(f"An error occurred while purging emails partition {name}: {e}")
+    finally:
+        conn.close()
+
+
+def archive_old_emails(retention_months=12, archive_dir="bkp"):
+    """
+    Retention policy: keep emails of the last `retention_months` months (plus the current one).
+    Older monthly partitions are dumped to <archive_dir>/<partition>.pkl
+    in the same format as backup_emails_to_pkl, and dropped.
+    Old rows left in emails_default are archived to <archive_dir>/emails_default_before_YYYY_MM.pkl
+    and deleted (the default partition only catches stray rows, so this stays small).
+    Archives can be loaded back with restore_emails_from_pkl(path).
+    """
+    conn = init_pg_conn()
+    if not conn:
+        _LOG.debug("No database connection available.")
+        return
+
+    import pickle
+
+    cutoff = add_months(month_start(date.today()), -retention_months)
+    select_query = sql.SQL(
+        "SELECT id, subject_title, from_addr, to_addr, received_date FROM {};"
+    )
+    drop_query = sql.SQL("DROP TABLE {};")
+    default_select_query = (
+        "SELECT id, subject_title, from_addr, to_addr, received_date "
+        "FROM emails_default WHERE received_date < %s;"
+    )
+    default_delete_query = "DELETE FROM emails_default WHERE received_date < %s;"
+    try:
+        for name, month in list_email_partitions(conn):
+            if month >= cutoff:
+                break
+
+            # dump and drop in one transaction, a failed dump leaves the partition in place
+            with conn.cursor() as cursor:
+                cursor.execute(select_query.format(sql.Identifier(name)))
+                emails = cursor.fetchall()
+            archive_path = os.path.join(archive_dir, f"{name}.pkl")
+            with open(archive_path, "wb") as pkl_file:
+                pickle.dump(emails, pkl_file)
+            with conn.cursor() as cursor:
+                cursor.execute(drop_query.format(sql.Identifier(name)))
+            conn.commit()
+            _LOG.debug(f"Archived {len(emails)} emails of {name} to {archive_path}")
+
+        with conn.cursor() as cursor:
+            cursor.execute(default_select_query, (cutoff,))
+            emails = cursor.fetchall()
+        if emails:
+            archive_path = os.path.join(
+                archive_dir, f"emails_default_before_{cutoff:%Y_%m}.pkl"
+            )
+            with open(archive_path, "wb") as pkl_file:
+                pickle.dump(emails, pkl_file)
+            with conn.cursor() as cursor:
+                cursor.execute(default_delete_query, (cutoff,))
+            conn.commit()
+            _LOG.debug(
+                f"Archived {len(emails)} emails of emails_default to {archive_path}"
+            )
+    except Exception as e:
+        conn.rollback()
+        _LOG.debug(f"An error occurred while archiving old emails: {e}")
+    finally:
+        conn.close()
+
+
+def restore_emails_from_pkl(path="bkp/emails_backup_db.pkl"):
     conn = init_pg_conn()
     if not conn:
         _LOG.debug("No database connection available.")
@@ -61,16 +162,15 @@ def restore_emails_from_pkl():
     import pickle
 
     try:
-        with open("bkp/emails_backup_db.pkl", "rb") as pkl_file:
+        with open(path, "rb") as pkl_file:
             emails = pickle.load(pkl_file)
 
+        ensure_email_partitions(conn, [email[4] for email in emails])
         insert_query = "INSERT INTO emails (id, subject_title, from_addr, to_addr, received_date) VALUES (%s, %s, %s, %s, %s);"
         with conn.cursor() as cursor:
             cursor.executemany(insert_query, emails)
         conn.commit()
-        _LOG.debug(
-            f"Restored {len(emails)} emails from emails_backup.pkl to the database."
-        )
+        _LOG.debug(f"Restored {len(emails)} emails from {path} to the database.")
     except Exception as e:
         _LOG.debug(f"An error occurred while restoring emails from pkl: {e}")
     finally:
@@ -0,0 +1,83 @@
+import logging
+import re
+
+from datetime import date, datetime, timedelta
+
+from psycopg2 import sql
+
+from utils.services import get_logger
+
+_LOG = get_logger(__name__, logging.DEBUG)
+
+"""
+Helpers to manage monthly range partitions of the emails table (see init_db/init.sql).
+
+Each month of received_date lives in its own partition named emails_YYYY_MM,
+so old data can be dropped instantly instead of DELETEd.
+Functions take an open connection and don't commit, callers own the transaction.
+"""
+
+PARTITION_NAME_RE = re.compile(r"^emails_(\d{4})_(\d{2})$")
+
+
+def month_start(value):
+    """Return first day of the month for a date/datetime."""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    """Shift the first day of a month by `months` (can be negative)."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    """Eg. 2025-11-01 becomes "emails_2025_11" """
+    return f"emails_{month:%Y_%m}"
+
+
+def ensure_email_partitions(conn, received_dates):
+    """
+    Create monthly partitions covering the given received dates if they don't exist yet.
+    Needs to run before inserting rows, otherwise they would land in emails_default.
+    """
+    months = set()
+    for received_date in received_dates:
+        if not isinstance(received_date, (date, datetime)):
+            continue
+        months.add(month_start(received_date))
+        # tz aware dates are cast to the session timezone on insert, which can move
+        # them to a neighbouring month. Rows of a month without partition would land in
+        # emails_default and later block creating that month's partition.
+        if isinstance(received_date, datetime) and received_date.tzinfo:
+            months.add(month_start(received_date - timedelta(days=1)))
+            months.add(month_start(received_date + timedelta(days=1)))
+    create_query = sql.SQL(
+        "CREATE TABLE IF NOT EXISTS {} PARTITION OF emails FOR VALUES FROM (%s) TO (%s);"
+    )
+    with conn.cursor() as cursor:
+        for month in sorted(months):
+            cursor.execute(
+                create_query.format(sql.Identifier(partition_name(month))),
+                (month, add_months(month, 1)),
+            )
+    _LOG.debug(f"Ensured {len(months)} monthly partitions of emails table.")
+
+
+def list_email_partitions(conn):
+    """Return (partition name, month) of all monthly partitions, oldest first."""
+    list_query = (
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'emails'::regclass;"
+    )
+    with conn.cursor() as cursor:
+        cursor.execute(list_query)
+        rows = cursor.fetchall()
+
+    partitions = []
+    for (name,) in rows:
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            partitions.append((name, date(int(match[1]), int(match[2]), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
@@ -41,9 +41,9 @@ def get_logger(name, level=logging.INFO):
 _LOG = get_logger(__name__, logging.DEBUG)
 
 
-def get_gmail_api_service():
+def get_gmail_credentials():
     """
-    returns Gmail API service
+    returns OAuth credentials for the Gmail API, running the consent flow if needed
     """
     creds = None
     # The file token.json stores the user's access and refresh tokens, and is
@@ -68,7 +68,14 @@ def get_gmail_api_service():
         # Save the credentials for the next run
         with open("secrets/token.json", "w") as token:
             token.write(creds.to_json())
+    return creds
 
+
+def get_gmail_api_service(creds=None):
+    """
+    returns Gmail API service, using given credentials or loading them with get_gmail_credentials
+    """
+    creds = creds or get_gmail_credentials()
     try:
         # Build Gmail API service and return it
         service = build("gmail", "v1", credentials=creds)